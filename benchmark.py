@@ -0,0 +1,142 @@
+import time
+import argparse
+from htmlparser import BACKENDS, HTMLParser, Collector, DataHandler
+from htmlparser.selector import Selector
+from htmlparser.jsinterpreter import Scanner, JSInterpreter, TokenType
+from tripadvparser import (ServicesHTMLParser, HotelsHTMLParser, HotelHTMLParser, HotelEmailHTMLParser,
+    HotelGalleryHTMLParser, HotelPriceHTMLParser)
+
+PARSERS = [ServicesHTMLParser, HotelsHTMLParser, HotelHTMLParser, HotelEmailHTMLParser, HotelGalleryHTMLParser, HotelPriceHTMLParser]
+
+
+class PhoneScriptHTMLParser(HTMLParser):
+    script = Collector("div.phone span script", DataHandler(), limit=1)
+
+
+def parse(parser_cls, html, backend=None):
+    parser = parser_cls(backend=backend)
+    try:
+        parser(html)
+    except Exception as e:
+        return "{}: {}".format(e.__class__.__name__, e)
+    return parser.data
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        elapsed_time = time.perf_counter() - start_time
+        if best is None or elapsed_time < best:
+            best = elapsed_time
+    return best
+
+
+def bench_selectors(pages, repeat):
+    print("{:<24}{:>14}{:>14}{:>10}".format("parser", "tree, ms", "state, ms", "speedup"))
+    for parser_cls in PARSERS:
+        results = {}
+        timings = {}
+        for compiled in (False, True):
+            Selector.compiled = compiled
+            results[compiled] = [parse(parser_cls, html) for html in pages]
+            timings[compiled] = measure(lambda: [parse(parser_cls, html) for html in pages], repeat)
+        Selector.compiled = True
+        if results[False] != results[True]:
+            raise AssertionError("{}: engines produce different data".format(parser_cls.__name__))
+        print("{:<24}{:>14.1f}{:>14.1f}{:>9.2f}x".format(
+            parser_cls.__name__, timings[False] * 1000, timings[True] * 1000, timings[False] / timings[True])
+        )
+
+
+def bench_backends(pages, repeat):
+    if "lxml" not in BACKENDS:
+        raise SystemExit("lxml is not installed")
+    print("{:<24}{:>14}{:>14}{:>10}".format("parser", "stdlib, ms", "lxml, ms", "speedup"))
+    for parser_cls in [HotelHTMLParser, HotelsHTMLParser, HotelGalleryHTMLParser, HotelPriceHTMLParser]:
+        results = {}
+        timings = {}
+        for backend in ("html.parser", "lxml"):
+            results[backend] = [parse(parser_cls, html, backend) for html in pages]
+            timings[backend] = measure(lambda: [parse(parser_cls, html, backend) for html in pages], repeat)
+        if results["html.parser"] != results["lxml"]:
+            raise AssertionError("{}: backends produce different data".format(parser_cls.__name__))
+        print("{:<24}{:>14.1f}{:>14.1f}{:>9.2f}x".format(
+            parser_cls.__name__, timings["html.parser"] * 1000, timings["lxml"] * 1000, timings["html.parser"] / timings["lxml"])
+        )
+
+
+def bench_depth(paths, pages, max_depth):
+    print("{:<40}{:>10}{:>10}{:>12}".format("page", "elements", "depth", "parse, ms"))
+    exceeded = []
+    for path, html in zip(paths, pages):
+        parser = HTMLParser(profile=True)
+        parser(html)
+        stats = parser.stats.documents[-1]
+        print("{:<40}{:>10}{:>10}{:>12.1f}".format(path[-40:], stats.element_count, stats.max_depth, stats.parse_time * 1000))
+        if max_depth is not None and stats.max_depth > max_depth:
+            exceeded.append(path)
+    if exceeded:
+        raise SystemExit("stack depth exceeds {}: {}".format(max_depth, ", ".join(exceeded)))
+
+
+def scan(script):
+    scanner = Scanner(script)
+    count = 0
+    while scanner.get_next_token().type is not TokenType.END:
+        count += 1
+    return count
+
+
+def bench_scanner(pages, repeat):
+    scripts = []
+    for html in pages:
+        parser = PhoneScriptHTMLParser()
+        parser(html)
+        if parser.data["script"]:
+            scripts.append(parser.data["script"])
+    if not scripts:
+        raise SystemExit("no phone scripts found")
+    token_count = sum(scan(script) for script in scripts)
+    scan_time = measure(lambda: [scan(script) for script in scripts], repeat)
+    interpreter = JSInterpreter()
+    parse_time = measure(lambda: [interpreter.parser(script) for script in scripts], repeat)
+    nodes = [interpreter.parser(script) for script in scripts]
+    results = {}
+    timings = {}
+    for compiled in (False, True):
+        JSInterpreter.compiled = compiled
+        loaded = [interpreter.load(node) for node in nodes]
+        results[compiled] = [script() for script in loaded]
+        timings[compiled] = measure(lambda: [script() for script in loaded], repeat)
+    JSInterpreter.compiled = True
+    if results[False] != results[True]:
+        raise AssertionError("tree and compiled interpreters produce different output")
+    print("{} scripts, {} tokens".format(len(scripts), token_count))
+    print("scan: {:.1f} us/script, {:.0f} tokens/s".format(scan_time / len(scripts) * 1e6, token_count / scan_time))
+    print("parse: {:.1f} us/script".format(parse_time / len(scripts) * 1e6))
+    print("execute: tree {:.1f} us/script, compiled {:.1f} us/script, {:.2f}x".format(
+        timings[False] / len(scripts) * 1e6, timings[True] / len(scripts) * 1e6, timings[False] / timings[True])
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("task", choices=["selectors", "backends", "depth", "scanner"], help="benchmark to run")
+    parser.add_argument("pages", nargs="+", help="saved html pages")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of repeats, the best time is reported")
+    parser.add_argument("--max-depth", type=int, help="fail if the stack depth of any page exceeds this value")
+    args = parser.parse_args()
+    pages = []
+    for path in args.pages:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    if args.task == "selectors":
+        bench_selectors(pages, args.repeat)
+    elif args.task == "backends":
+        bench_backends(pages, args.repeat)
+    elif args.task == "depth":
+        bench_depth(args.pages, pages, args.max_depth)
+    elif args.task == "scanner":
+        bench_scanner(pages, args.repeat)
@@ -1,16 +1,35 @@
 from html import parser
-from collections import deque
-from htmlparser.selector import Selector
+import time
+import codecs
+import importlib.util
+from htmlparser.selector import Selector, ClassSelector, AttrSelector
 import collections.abc
 
-__all__ = ["DataHandler", "AttrHandler", "IntHandler", "ValueHandlerError", "Collector", "CollectorError", "HTMLParser"]
+__all__ = ["DataHandler", "AttrHandler", "IntHandler", "ValueHandlerError", "Collector", "CollectorError", "HTMLParser", "ParserSet", "ParserStats", "ParseResult", "parse_many"]
 
 class HTMLElement:
-    def __init__(self, name, attrs):
+    __slots__ = ("name", "raw_attrs", "_attrs", "_classes", "data_nodes", "candidate", "state")
+
+    def __init__(self, name, attrs, candidate=True):
         self.name = name
-        self.attrs = dict(attrs)
-        self.classes = set(self.attrs.get("class", "").split())
-        self.data_nodes = []
+        self.raw_attrs = attrs
+        self._attrs = None
+        self._classes = None
+        self.data_nodes = [] if candidate else None
+        self.candidate = candidate
+        self.state = None
+
+    @property
+    def attrs(self):
+        if self._attrs is None:
+            self._attrs = dict(reversed(self.raw_attrs))
+        return self._attrs
+
+    @property
+    def classes(self):
+        if self._classes is None:
+            self._classes = set(self.attrs.get("class", "").split())
+        return self._classes
 
     def has_class(self, name):
         return name in self.classes
@@ -26,41 +45,221 @@ class HTMLElement:
         return "<{}>".format(self.name)
 
 
-class HTMLTreeParser(parser.HTMLParser):
-    VOID_TAGS = set(["area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "meta", "param", "source", "track", "wbr"])
+class PrunedElement:
+    __slots__ = ("name", "state")
+    attrs = {}
+    classes = frozenset()
+    data_nodes = None
+    candidate = False
 
-    def __init__(self, handler):
-        super().__init__()
+    def __init__(self, name, state=None):
+        self.name = name
+        self.state = state
+
+    def has_class(self, name):
+        return False
+
+    def has_attr(self, name, value=None):
+        return False
+
+    def __str__(self):
+        return "<{}>".format(self.name)
+
+
+class StopParsing(Exception):
+    pass
+
+
+class HTMLTreeBuilder:
+    VOID_TAGS = set(["area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "meta", "param", "source", "track", "wbr"])
+    P_CLOSING_TAGS = set([
+        "address", "article", "aside", "blockquote", "center", "details", "dialog", "dir", "div", "dl", "dd", "dt",
+        "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hgroup",
+        "hr", "li", "main", "menu", "nav", "ol", "p", "pre", "section", "summary", "table", "ul"
+    ])
+    P_SCOPE_TAGS = set(["applet", "button", "caption", "html", "marquee", "object", "table", "td", "template", "th"])
+    IMPLICIT_CLOSES = {
+        "li": (set(["li"]), set(["ol", "ul", "menu", "table"])),
+        "dt": (set(["dt", "dd"]), set(["dl", "table"])),
+        "dd": (set(["dt", "dd"]), set(["dl", "table"])),
+        "tr": (set(["tr"]), set(["table", "thead", "tbody", "tfoot"])),
+        "td": (set(["td", "th"]), set(["tr", "table"])),
+        "th": (set(["td", "th"]), set(["tr", "table"])),
+        "thead": (set(["thead", "tbody", "tfoot"]), set(["table"])),
+        "tbody": (set(["thead", "tbody", "tfoot"]), set(["table"])),
+        "tfoot": (set(["thead", "tbody", "tfoot"]), set(["table"])),
+        "option": (set(["option"]), set(["select", "datalist", "optgroup"])),
+        "optgroup": (set(["optgroup", "option"]), set(["select"]))
+    }
+
+    def __init__(self, handler, index=None):
         self.handler = handler
+        self.index = index
+        self.elements = []
+        self.stopped = False
+        self.element_count = 0
+        self.max_depth = 0
 
     def handle_starttag(self, tag, attrs):
-        if self.elements and self.elements[-1] in self.VOID_TAGS:
-            self.handle_endtag(self.elements[-1].name)
-        self.elements.append(HTMLElement(tag, attrs))
+        if tag in self.IMPLICIT_CLOSES:
+            self.close_implicitly(*self.IMPLICIT_CLOSES[tag])
+        if tag in self.P_CLOSING_TAGS:
+            self.close_implicitly(("p",), self.P_SCOPE_TAGS)
+        self.element_count += 1
+        if len(self.elements) >= self.max_depth:
+            self.max_depth = len(self.elements) + 1
+        if self.index is None:
+            element = HTMLElement(tag, attrs)
+        else:
+            state = self.elements[-1].state if self.elements else self.index.initial_state
+            if self.index.is_relevant(tag, attrs):
+                element = HTMLElement(tag, attrs, False)
+                if self.index.is_candidate(element):
+                    element.candidate = True
+                    element.data_nodes = []
+                element.state = self.index.advance(element, state)
+            else:
+                element = PrunedElement(tag, state)
+        self.elements.append(element)
+        if tag in self.VOID_TAGS:
+            self.pop(len(self.elements) - 1)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self.VOID_TAGS:
+            self.handle_endtag(tag)
 
     def handle_endtag(self, tag):
-        while self.elements:
-            self.handler(self.elements)
-            element = self.elements.pop()
-            if element.name == tag:
+        for i in range(len(self.elements) - 1, -1, -1):
+            if self.elements[i].name == tag:
+                self.pop(i)
                 break
 
+    def close_implicitly(self, tags, scope_tags):
+        for i in range(len(self.elements) - 1, -1, -1):
+            name = self.elements[i].name
+            if name in tags:
+                self.pop(i)
+                break
+            if name in scope_tags:
+                break
+
+    def pop(self, depth):
+        while len(self.elements) > depth:
+            if self.elements[-1].candidate:
+                self.handler(self.elements)
+            self.elements.pop()
+
     def handle_data(self, data):
-        if self.elements:
+        if self.elements and self.elements[-1].candidate:
             self.elements[-1].data_nodes.append(data)
 
+    def end(self):
+        if not self.stopped:
+            try:
+                self.pop(0)
+            except StopParsing:
+                self.stopped = True
+
+
+class HTMLTreeParser(HTMLTreeBuilder, parser.HTMLParser):
+    def __init__(self, handler, index=None):
+        HTMLTreeBuilder.__init__(self, handler, index)
+        parser.HTMLParser.__init__(self)
+
     def feed(self, data):
-        super().feed(data)
-        self.handle_endtag("")
+        try:
+            super().feed(data)
+        except StopParsing:
+            self.stopped = True
+
+    def feed_chunk(self, data):
+        data = self.pending + data
+        i = data.rfind("<")
+        if i > 0:
+            self.pending = data[i:]
+            self.feed(data[:i])
+        else:
+            self.pending = data
+
+    def end(self):
+        if self.pending and not self.stopped:
+            self.feed(self.pending)
+        self.pending = ""
+        super().end()
 
     def reset(self):
         super().reset()
-        self.elements = deque()
+        self.elements = []
+        self.pending = ""
+        self.stopped = False
+
+
+class LxmlTarget:
+    def __init__(self, builder):
+        self.builder = builder
+        self.text = []
+
+    def flush(self):
+        if self.text:
+            self.builder.handle_data("".join(self.text))
+            self.text = []
+
+    def start(self, tag, attrib):
+        self.flush()
+        self.builder.handle_starttag(tag, list(attrib.items()))
+
+    def end(self, tag):
+        self.flush()
+        self.builder.handle_endtag(tag)
+
+    def data(self, data):
+        self.text.append(data)
+
+    def comment(self, text):
+        self.flush()
+
+    def close(self):
+        self.flush()
+
+
+class LxmlTreeParser(HTMLTreeBuilder):
+    def __init__(self, handler, index=None):
+        super().__init__(handler, index)
+        from lxml import etree
+        self.parser = etree.HTMLParser(target=LxmlTarget(self))
+
+    def feed(self, data):
+        try:
+            self.parser.feed(data)
+        except StopParsing:
+            self.stopped = True
+
+    def feed_chunk(self, data):
+        self.feed(data)
+
+    def end(self):
+        if not self.stopped:
+            try:
+                self.parser.close()
+            except StopParsing:
+                self.stopped = True
+        super().end()
+
+
+BACKENDS = {"html.parser": HTMLTreeParser}
+if importlib.util.find_spec("lxml") is not None:
+    BACKENDS["lxml"] = LxmlTreeParser
 
 
 class ValueHandlerError(Exception):
     def __init__(self, name, message):
         super().__init__("collector '{}': {}".format(name, message))
+        self.name = name
+        self.message = message
+
+    def __reduce__(self):
+        return self.__class__, (self.name, self.message)
 
 
 class DataHandler:
@@ -120,14 +319,19 @@ class Collector:
         self.default_value = default_value
 
     def __call__(self, name, elements):
-        i = self.selector(elements)
+        return self.handle(name, elements[-1], self.selector(elements))
+
+    def handle(self, name, element, i):
         if i > -1:
             if self.value_handler:
                 if isinstance(self.value_handler, collections.abc.Sequence):
-                    return self.value_handler[i](name, elements[-1])
-                return self.value_handler(name, elements[-1])
+                    return self.value_handler[i](name, element)
+                return self.value_handler(name, element)
             return True
 
+    def is_bounded(self):
+        return bool(self.value_handler and self.limit)
+
     def clean(self, name, result):
         if self.min_pass_count > len(result):
             raise CollectorError("the number of collector ('{}') passes ({}) is less than the minimum number of passes ({})".format(
@@ -146,10 +350,192 @@ class Collector:
             return result if self.default_value is None else self.default_value
 
 
-class HTMLParser:
+class CollectorIndex:
+    def __init__(self, collectors):
+        self.collectors = collectors
+        self.tags = {}
+        self.classes = {}
+        self.attrs = {}
+        self.relevant_tags = set()
+        self.relevant_classes = {}
+        self.relevant_attrs = {}
+        self.collector_lists = []
+        self.lengths = []
+        self.tests = []
+        self.advances = {}
+        for i, (name, collector) in enumerate(collectors):
+            list_ids = []
+            for selector_list in collector.selector.selector_group.selectors:
+                list_id = len(self.lengths)
+                list_ids.append(list_id)
+                self.lengths.append(len(selector_list.selectors) - 1)
+                self.tests.append(selector_list.selectors[-1].compile())
+                for k, chain in enumerate(selector_list.selectors[:-1]):
+                    self.advances.setdefault(chain.tag, []).append((list_id, k, chain.compile()))
+                for chain in selector_list.selectors:
+                    type_, key = chain.key()
+                    if type_ is ClassSelector:
+                        self.relevant_classes.setdefault(chain.tag, set()).add(key)
+                    elif type_ is AttrSelector:
+                        self.relevant_attrs.setdefault(chain.tag, set()).add(key)
+                    else:
+                        self.relevant_tags.add(chain.tag)
+                chain = selector_list.selectors[-1]
+                type_, key = chain.key()
+                if type_ is ClassSelector:
+                    index = self.classes.setdefault(chain.tag, {}).setdefault(key, [])
+                elif type_ is AttrSelector:
+                    index = self.attrs.setdefault(chain.tag, {}).setdefault(key, [])
+                else:
+                    index = self.tags.setdefault(chain.tag, [])
+                if i not in index:
+                    index.append(i)
+            self.collector_lists.append(list_ids)
+        self.initial_state = (0,) * len(self.lengths)
+
+    def __call__(self, element):
+        return [self.collectors[i] for i in self.candidates(element)]
+
+    def candidates(self, element):
+        indexes = self.tags.get(element.name)
+        groups = [indexes] if indexes else []
+        classes = self.classes.get(element.name)
+        if classes:
+            for class_ in element.classes:
+                indexes = classes.get(class_)
+                if indexes:
+                    groups.append(indexes)
+        attrs = self.attrs.get(element.name)
+        if attrs:
+            for attr in element.attrs:
+                indexes = attrs.get(attr)
+                if indexes:
+                    groups.append(indexes)
+        if not groups:
+            return ()
+        if len(groups) == 1:
+            return groups[0]
+        return sorted(set(i for indexes in groups for i in indexes))
+
+    def advance(self, element, state):
+        advances = self.advances.get(element.name)
+        if advances:
+            new_state = None
+            for list_id, k, test in advances:
+                if state[list_id] == k and test(element):
+                    if new_state is None:
+                        new_state = list(state)
+                    new_state[list_id] = k + 1
+            if new_state is not None:
+                return tuple(new_state)
+        return state
+
+    def match(self, i, elements):
+        if not Selector.compiled:
+            return self.collectors[i][1].selector(elements)
+        element = elements[-1]
+        state = elements[-2].state if len(elements) > 1 else self.initial_state
+        for j, list_id in enumerate(self.collector_lists[i]):
+            if state[list_id] == self.lengths[list_id] and self.tests[list_id](element):
+                return j
+        return -1
+
+    def is_candidate(self, element):
+        if element.name in self.tags:
+            return True
+        classes = self.classes.get(element.name)
+        if classes and not classes.keys().isdisjoint(element.classes):
+            return True
+        attrs = self.attrs.get(element.name)
+        if attrs and not attrs.keys().isdisjoint(element.attrs):
+            return True
+        return False
+
+    def is_relevant(self, tag, attrs):
+        if tag in self.relevant_tags:
+            return True
+        classes = self.relevant_classes.get(tag)
+        attr_names = self.relevant_attrs.get(tag)
+        if classes is None and attr_names is None:
+            return False
+        for name, value in attrs:
+            if attr_names and name in attr_names:
+                return True
+            if classes and name == "class" and value and not classes.isdisjoint(value.split()):
+                return True
+        return False
+
+
+class CollectorStats:
     def __init__(self):
+        self.evaluations = 0
+        self.matches = 0
+        self.match_time = 0.0
+        self.handler_time = 0.0
+        self.errors = 0
+
+    def update(self, other):
+        self.evaluations += other.evaluations
+        self.matches += other.matches
+        self.match_time += other.match_time
+        self.handler_time += other.handler_time
+        self.errors += other.errors
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class DocumentStats:
+    def __init__(self, parse_time, collector_time, element_count, max_depth):
+        self.parse_time = parse_time
+        self.collector_time = collector_time
+        self.element_count = element_count
+        self.max_depth = max_depth
+
+    @property
+    def tokenize_time(self):
+        return self.parse_time - self.collector_time
+
+    def as_dict(self):
+        result = dict(vars(self))
+        result["tokenize_time"] = self.tokenize_time
+        return result
+
+
+class ParserStats:
+    def __init__(self):
+        self.collectors = {}
+        self.documents = []
+
+    def collector(self, name):
+        stats = self.collectors.get(name)
+        if stats is None:
+            stats = self.collectors[name] = CollectorStats()
+        return stats
+
+    def update(self, other):
+        for name, stats in other.collectors.items():
+            self.collector(name).update(stats)
+        self.documents.extend(other.documents)
+
+    def as_dict(self):
+        return {
+            "collectors": {name: stats.as_dict() for name, stats in self.collectors.items()},
+            "documents": [stats.as_dict() for stats in self.documents]
+        }
+
+
+class HTMLParser:
+    CHUNK_SIZE = 65536
+    backend = "html.parser"
+
+    def __init__(self, early_exit=False, backend=None, profile=False):
         self.disabled_collectors = set()
         self.data_init = True
+        self.early_exit = early_exit
+        if backend is not None:
+            self.backend = backend
+        self.stats = ParserStats() if profile else None
 
     def enable(self, *names):
         self.disabled_collectors.update(names)
@@ -160,12 +546,37 @@ class HTMLParser:
     def is_enabled(self, name):
         return not (name in self.disabled_collectors)
 
+    @classmethod
+    def collector_index(cls):
+        index = cls.__dict__.get("_collector_index")
+        if index is None:
+            index = CollectorIndex([(name, val) for name, val in cls.__dict__.items() if isinstance(val, Collector)])
+            cls._collector_index = index
+        return index
+
     def collectors(self):
-        for name, val in self.__class__.__dict__.items():
-            if isinstance(val, Collector):
-                yield name, val
+        return iter(self.collector_index().collectors)
 
     def __call__(self, html, clean=True):
+        if self.begin(html):
+            if self.stats is None:
+                self.feed(self.tree_parser(self.proc_collectors, self.collector_index()), html)
+            else:
+                self.profile(html)
+        self.finish(clean)
+
+    def profile(self, html):
+        self.collector_time = 0.0
+        tree_parser = self.tree_parser(self.proc_collectors_profiled, self.collector_index())
+        start_time = time.perf_counter()
+        try:
+            self.feed(tree_parser, html)
+        finally:
+            self.stats.documents.append(DocumentStats(
+                time.perf_counter() - start_time, self.collector_time, tree_parser.element_count, tree_parser.max_depth
+            ))
+
+    def begin(self, html):
         if self.data_init:
             self.data = {}
             for name, collector in self.collectors():
@@ -175,8 +586,19 @@ class HTMLParser:
                     self.data[name] = 0
             self.data_init = False
         self.html = html
-        parser = HTMLTreeParser(self.proc_collectors)
-        parser.feed(html)
+        self.pending_collectors = None
+        if self.early_exit:
+            self.pending_collectors = set()
+            for name, collector in self.collectors():
+                if self.is_enabled(name):
+                    if not collector.is_bounded():
+                        self.pending_collectors = None
+                        break
+                    if len(self.data[name]) < collector.limit:
+                        self.pending_collectors.add(name)
+        return not self.is_done()
+
+    def finish(self, clean=True):
         if clean:
             for name, collector in self.collectors():
                 if self.is_enabled(name) and collector.value_handler:
@@ -185,12 +607,130 @@ class HTMLParser:
                 self.clean()
             self.data_init = True
 
+    def is_done(self):
+        return self.pending_collectors is not None and not self.pending_collectors
+
+    def is_active(self, name):
+        return self.is_enabled(name) and (self.pending_collectors is None or name in self.pending_collectors)
+
+    def tree_parser(self, handler, index):
+        return BACKENDS.get(self.backend, HTMLTreeParser)(handler, index)
+
+    def feed(self, parser, html, encoding="utf-8"):
+        if isinstance(html, (bytes, bytearray)):
+            html = html.decode(encoding)
+        if isinstance(html, str):
+            parser.feed(html)
+        else:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            while not parser.stopped:
+                data = html.read(self.CHUNK_SIZE)
+                if not data:
+                    parser.feed_chunk(decoder.decode(b"", True))
+                    break
+                parser.feed_chunk(data if isinstance(data, str) else decoder.decode(data))
+        parser.end()
+
+    def collect(self, name, collector, val):
+        if val is not None:
+            if collector.value_handler:
+                self.data[name].append(val)
+                if self.pending_collectors is not None and len(self.data[name]) >= collector.limit:
+                    self.pending_collectors.discard(name)
+            else:
+                self.data[name] += 1
+
     def proc_collectors(self, elements):
-        for name, collector in self.collectors():
-            if self.is_enabled(name):
-                val = collector(name, elements)
-                if val is not None:
-                    if collector.value_handler:
-                        self.data[name].append(val)
-                    else:
-                        self.data[name] += 1
+        index = self.collector_index()
+        for i in index.candidates(elements[-1]):
+            name, collector = index.collectors[i]
+            if self.is_active(name):
+                self.collect(name, collector, collector.handle(name, elements[-1], index.match(i, elements)))
+                if self.is_done():
+                    raise StopParsing
+
+    def proc_collectors_profiled(self, elements):
+        index = self.collector_index()
+        for i in index.candidates(elements[-1]):
+            name, collector = index.collectors[i]
+            if self.is_active(name):
+                stats = self.stats.collector(name)
+                start_time = time.perf_counter()
+                j = index.match(i, elements)
+                match_time = time.perf_counter() - start_time
+                stats.evaluations += 1
+                stats.match_time += match_time
+                self.collector_time += match_time
+                if j > -1:
+                    stats.matches += 1
+                    start_time = time.perf_counter()
+                    try:
+                        val = collector.handle(name, elements[-1], j)
+                    except ValueHandlerError:
+                        stats.errors += 1
+                        raise
+                    finally:
+                        handler_time = time.perf_counter() - start_time
+                        stats.handler_time += handler_time
+                        self.collector_time += handler_time
+                    self.collect(name, collector, val)
+                    if self.is_done():
+                        raise StopParsing
+
+
+class ParserSet:
+    indexes = {}
+
+    def __init__(self, *parsers):
+        self.parsers = parsers
+        self.owners = []
+        collectors = []
+        for parser in parsers:
+            for name, collector in parser.collectors():
+                self.owners.append(parser)
+                collectors.append((name, collector))
+        key = tuple(parser.__class__ for parser in parsers)
+        self.index = self.indexes.get(key)
+        if self.index is None:
+            self.index = self.indexes[key] = CollectorIndex(collectors)
+
+    def __call__(self, html, clean=True):
+        if any([parser.begin(html) for parser in self.parsers]):
+            parser = self.parsers[0]
+            parser.feed(parser.tree_parser(self.proc_collectors, self.index), html)
+        for parser in self.parsers:
+            parser.finish(clean)
+        return [parser.data for parser in self.parsers]
+
+    def proc_collectors(self, elements):
+        for i in self.index.candidates(elements[-1]):
+            name, collector = self.index.collectors[i]
+            parser = self.owners[i]
+            if parser.is_active(name):
+                parser.collect(name, collector, collector.handle(name, elements[-1], self.index.match(i, elements)))
+                if parser.is_done() and all(parser.is_done() for parser in self.parsers):
+                    raise StopParsing
+
+
+class ParseResult:
+    def __init__(self, index, data=None, error=None):
+        self.index = index
+        self.data = data
+        self.error = error
+
+
+def parse_document(parser_cls, index, document):
+    parser = parser_cls()
+    try:
+        parser(document)
+    except (ValueHandlerError, CollectorError) as e:
+        return ParseResult(index, error=e)
+    return ParseResult(index, parser.data)
+
+
+def parse_many(parser_cls, documents, workers=None, ordered=True):
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(parse_document, parser_cls, i, document) for i, document in enumerate(documents)]
+        for future in futures if ordered else concurrent.futures.as_completed(futures):
+            yield future.result()
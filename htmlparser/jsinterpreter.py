@@ -1,6 +1,7 @@
 #TODO refactor code
 import re
 from enum import Enum, auto
+from collections import OrderedDict
 
 class TokenType(Enum):
     NEW_LINE = auto()
@@ -64,64 +65,69 @@ class FuncCallError(JSInterpreterError):
 
 class Scanner:
     LEXEM_PATTERNS = [
-        (re.compile(r" "), None),
-        (re.compile(r"\n"), TokenType.NEW_LINE),
-        (re.compile(r"\+="), TokenType.ADD_ASSIGN),
-        (re.compile(r"\+"), TokenType.ADD),
-        (re.compile(r"="), TokenType.ASSIGN),
-        (re.compile(r"\("), TokenType.LEFT_PAREN),
-        (re.compile(r"\)"), TokenType.RIGHT_PAREN),
-        (re.compile(r"\{"), TokenType.BEGIN_SCOPE),
-        (re.compile(r"\}"), TokenType.END_SCOPE),
-        (re.compile(r","), TokenType.COMMA),
-        (re.compile(r"//.*|<!--.*"), None),
-        (re.compile(r"document\.write"), TokenType.DOCUMENT_WRITE),
-        (re.compile(r"[a-zA-Z_]\w*"), TokenType.IDENTIFIER),
-        (re.compile(r"'([ 0-9()+-]*)'"), TokenType.STRING)
-    ]
-    KEYWORD_PATTERNS = [
-        (re.compile(r"function"), TokenType.FUNCTION),
-        (re.compile(r"var"), TokenType.VAR)
+        ("SPACE", r" "),
+        ("NEW_LINE", r"\n"),
+        ("ADD_ASSIGN", r"\+="),
+        ("ADD", r"\+"),
+        ("ASSIGN", r"="),
+        ("LEFT_PAREN", r"\("),
+        ("RIGHT_PAREN", r"\)"),
+        ("BEGIN_SCOPE", r"\{"),
+        ("END_SCOPE", r"\}"),
+        ("COMMA", r","),
+        ("COMMENT", r"//.*|<!--.*"),
+        ("DOCUMENT_WRITE", r"document\.write"),
+        ("IDENTIFIER", r"[a-zA-Z_]\w*"),
+        ("STRING", r"'(?P<STRING_VALUE>[ 0-9()+-]*)'")
     ]
+    PATTERN = re.compile("|".join("(?P<{}>{})".format(name, pattern) for name, pattern in LEXEM_PATTERNS))
+    TOKEN_TYPES = {name: getattr(TokenType, name, None) for name, _ in LEXEM_PATTERNS}
+    KEYWORDS = {
+        "function": TokenType.FUNCTION,
+        "var": TokenType.VAR
+    }
 
     def __init__(self, code):
         self.code = code
-        self.pos = 0
-        self.line_number = 0
-        self.rel_pos = 0
-        self.prev_token_type = None
+        self.tokens = self.tokenize()
+
+    def tokenize(self):
+        code = self.code
+        token_types = self.TOKEN_TYPES
+        keywords = self.KEYWORDS
+        line_number = 0
+        line_start = 0
+        prev_token_type = None
+        match = self.PATTERN.scanner(code).match
+        pos = 0
+        for m in iter(match, None):
+            token_type = token_types[m.lastgroup]
+            if token_type is not None:
+                if token_type is TokenType.NEW_LINE:
+                    line_number += 1
+                    rel_pos = pos - line_start
+                    line_start = m.end()
+                    if prev_token_type is not TokenType.NEW_LINE and prev_token_type is not None:
+                        prev_token_type = token_type
+                        yield Token(token_type, "\n", line_number, rel_pos)
+                else:
+                    if token_type is TokenType.IDENTIFIER:
+                        value = m.group()
+                        token_type = keywords.get(value, token_type)
+                    elif token_type is TokenType.STRING:
+                        value = m.group("STRING_VALUE")
+                    else:
+                        value = m.group()
+                    prev_token_type = token_type
+                    yield Token(token_type, value, line_number, pos - line_start)
+            pos = m.end()
+        if pos < len(code):
+            raise ScannerError(code[pos], line_number, pos - line_start)
+        while True:
+            yield Token(TokenType.END, "EOF", line_number, pos - line_start)
 
     def get_next_token(self):
-        while self.pos < len(self.code):
-            match = None
-            for pattern, token_type in self.LEXEM_PATTERNS:
-                group_index = 0
-                match = pattern.match(self.code, self.pos)
-                if match is not None:
-                    rel_pos = self.rel_pos
-                    self.rel_pos += match.end() - self.pos
-                    self.pos = match.end()
-                    if token_type is None:
-                        break
-                    elif token_type is TokenType.NEW_LINE:
-                        self.line_number += 1
-                        self.rel_pos = 0
-                        if self.prev_token_type in [TokenType.NEW_LINE, None]:
-                            break
-                    elif token_type is TokenType.IDENTIFIER:
-                        for pattern, new_token_type in self.KEYWORD_PATTERNS:
-                            new_match = pattern.fullmatch(match.group())
-                            if new_match:
-                                match = new_match
-                                token_type = new_token_type
-                                break
-                    elif token_type is TokenType.STRING:
-                        group_index = 1
-                    self.prev_token_type = token_type
-                    return Token(token_type, match.group(group_index), self.line_number, rel_pos)
-            if match is None:
-                raise ScannerError(self.code[self.pos], self.line_number, self.position)
-        return Token(TokenType.END, "EOF", self.line_number, self.rel_pos)
+        return next(self.tokens)
 
 
 # EBNFs rules:
@@ -136,6 +142,11 @@ class Scanner:
 # ADD => '+'
 
 
+class LiteralNode:
+    def __init__(self, index):
+        self.index = index
+
+
 class VarNode:
     def __init__(self, name, line_number, position):
         self.name = name
@@ -192,6 +203,27 @@ class DocumentWriteCallNode:
         self.expr = expr
 
 
+def memoize(rule):
+    def wrapper(self):
+        key = (rule, self.pos)
+        try:
+            result = self.memo[key]
+        except KeyError:
+            try:
+                node = rule(self)
+            except ParserError:
+                self.memo[key] = None
+                raise
+            self.memo[key] = (node, self.pos)
+            return node
+        if result is None:
+            self.raise_error()
+        node, pos = result
+        self.reset(pos)
+        return node
+    return wrapper
+
+
 class Parser:
     def get_next_token(self):
         if self.pos > -1 and self.pos < len(self.buf) - 1:
@@ -228,20 +260,23 @@ class Parser:
                 self.raise_error(e)
         return statements
 
+    @memoize
     def proc_scope(self):
         pos = self.pos
         rules = [
-            self.proc_func_def,
-            self.proc_var_def,
-            self.proc_assign,
-            self.proc_add_assign,
-            self.proc_document_write_call,
-            self.proc_func_call
+            (TokenType.FUNCTION, self.proc_func_def),
+            (TokenType.VAR, self.proc_var_def),
+            (TokenType.IDENTIFIER, self.proc_assign),
+            (TokenType.IDENTIFIER, self.proc_add_assign),
+            (TokenType.DOCUMENT_WRITE, self.proc_document_write_call),
+            (TokenType.IDENTIFIER, self.proc_func_call)
         ]
         statements = []
         while True:
             found = False
-            for rule in rules:
+            for token_type, rule in rules:
+                if self.token.type is not token_type:
+                    continue
                 try:
                     statements.append(rule())
                     self.skip_new_line()
@@ -250,6 +285,7 @@ class Parser:
                 except ParserError as e:
                     self.raise_error(e, True)
             if not found:
+                self.raise_error(ParserError(self.token, self.pos + 1), True)
                 self.reset(pos)
                 break
             else:
@@ -262,6 +298,7 @@ class Parser:
         if not silent:
             raise self.error
 
+    @memoize
     def proc_func_def(self):
         pos = self.pos
         try:
@@ -296,6 +333,7 @@ class Parser:
         if error:
             self.raise_error(error)
 
+    @memoize
     def proc_var_def(self):
         pos = self.pos
         try:
@@ -336,6 +374,7 @@ class Parser:
             return VarNode(self.eaten_token.value, self.eaten_token.line_number, self.eaten_token.position)
         return self.eaten_token.value
 
+    @memoize
     def proc_string_expr(self):
         pos = self.pos
         try:
@@ -363,6 +402,7 @@ class Parser:
             except ParserError:
                 break
 
+    @memoize
     def proc_assign(self):
         pos = self.pos
         try:
@@ -380,6 +420,7 @@ class Parser:
             self.reset(pos)
             self.raise_error(e)
 
+    @memoize
     def proc_add_assign(self):
         pos = self.pos
         try:
@@ -397,6 +438,7 @@ class Parser:
             self.reset(pos)
             self.raise_error(e)
 
+    @memoize
     def proc_func_call(self):
         pos = self.pos
         try:
@@ -414,6 +456,7 @@ class Parser:
             self.reset(pos)
             self.raise_error(e)
 
+    @memoize
     def proc_document_write_call(self):
         pos = self.pos
         try:
@@ -435,13 +478,53 @@ class Parser:
         self.pos = -1
         self.eaten_end = False
         self.error = None
+        self.memo = {}
         self.token = self.get_next_token()
         return self.proc_script()
 
 
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.items[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.maxsize:
+            self.items.popitem(False)
+
+    def info(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.items),
+            "maxsize": self.maxsize
+        }
+
+
 class JSInterpreter:
-    def __init__(self):
+    compiled = True
+
+    def __init__(self, cache_size=0, template_cache_size=0):
         self.parser = Parser()
+        self.literals = None
+        self.results = LRUCache(cache_size) if cache_size else None
+        self.templates = LRUCache(template_cache_size) if template_cache_size else None
 
     def get(self, scopes, name, line_number, position):
         for scope in reversed(scopes):
@@ -492,6 +575,8 @@ class JSInterpreter:
         for arg in arguments:
             if isinstance(arg, VarNode):
                 arg = self.get(scopes, arg.name, arg.line_number, arg.position)
+            elif isinstance(arg, LiteralNode):
+                arg = self.literals[arg.index]
             new_arguments.append(arg)
         return "".join(new_arguments)
 
@@ -513,11 +598,206 @@ class JSInterpreter:
             raise FuncCallError(node.name, node.line_number, node.position)
         self.exec_code_block(body, scopes)
 
-    def __call__(self, code):
+    def resolve(self, chain, name):
+        for depth in range(len(chain) - 1, -1, -1):
+            slot = chain[depth].get(name)
+            if slot is not None:
+                return depth, slot
+        return None
+
+    def compile_code_block(self, node, chain):
+        names = {}
+        values = []
+        for statement in node.statements:
+            if isinstance(statement, FuncDefNode):
+                definitions = [(statement.name, statement.body)]
+            elif isinstance(statement, VarDefNode):
+                definitions = [(name, "undefined") for name in statement.variables]
+            else:
+                continue
+            for name, value in definitions:
+                if name in names:
+                    values[names[name]] = value
+                else:
+                    names[name] = len(values)
+                    values.append(value)
+        chain = chain + [names]
+        steps = []
+        for statement in node.statements:
+            if isinstance(statement, AssignNode):
+                steps.append(self.compile_assign(statement, chain))
+            elif isinstance(statement, AddAssignNode):
+                steps.append(self.compile_add_assign(statement, chain))
+            elif isinstance(statement, DocumentWriteCallNode):
+                steps.append(self.compile_document_write_call(statement, chain))
+            elif isinstance(statement, FuncCallNode):
+                steps.append(self.compile_func_call(statement, chain))
+
+        def code_block(frames, out, literals):
+            frames.append(values[:])
+            for step in steps:
+                step(frames, out, literals)
+            del frames[-1]
+        return code_block
+
+    def compile_string_expr(self, arguments, chain):
+        parts = []
+        for arg in arguments:
+            if isinstance(arg, str):
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += arg
+                else:
+                    parts.append(arg)
+            elif isinstance(arg, LiteralNode):
+                parts.append(lambda frames, literals, index=arg.index: literals[index])
+            else:
+                parts.append(self.compile_get(arg.name, arg.line_number, arg.position, chain))
+        if len(parts) == 1 and isinstance(parts[0], str):
+            value = parts[0]
+            return lambda frames, literals: value
+        parts = [(lambda frames, literals, value=part: value) if isinstance(part, str) else part for part in parts]
+        return lambda frames, literals: "".join([part(frames, literals) for part in parts])
+
+    def compile_get(self, name, line_number, position, chain):
+        found = self.resolve(chain, name)
+        if found is None:
+            def get(frames, literals):
+                raise NameError(name, line_number, position)
+            return get
+        depth, slot = found
+        return lambda frames, literals: frames[depth][slot]
+
+    def compile_assign(self, node, chain):
+        expr = self.compile_string_expr(node.expr.arguments, chain)
+        found = self.resolve(chain, node.name)
+        if found is None:
+            def assign(frames, out, literals):
+                expr(frames, literals)
+                raise NameError(node.name, node.line_number, node.position)
+            return assign
+        depth, slot = found
+
+        def assign(frames, out, literals):
+            frames[depth][slot] = expr(frames, literals)
+        return assign
+
+    def compile_add_assign(self, node, chain):
+        expr = self.compile_string_expr(node.expr.arguments, chain)
+        found = self.resolve(chain, node.name)
+        if found is None:
+            def add_assign(frames, out, literals):
+                raise NameError(node.name, node.line_number, node.position)
+            return add_assign
+        depth, slot = found
+
+        def add_assign(frames, out, literals):
+            frame = frames[depth]
+            frame[slot] = frame[slot] + expr(frames, literals)
+        return add_assign
+
+    def compile_document_write_call(self, node, chain):
+        expr = self.compile_string_expr(node.expr.arguments, chain)
+        return lambda frames, out, literals: out.append(expr(frames, literals))
+
+    def compile_func_call(self, node, chain):
+        found = self.resolve(chain, node.name)
+        if found is None:
+            def func_call(frames, out, literals):
+                raise NameError(node.name, node.line_number, node.position)
+            return func_call
+        depth, slot = found
+        bodies = {}
+
+        def func_call(frames, out, literals):
+            body = frames[depth][slot]
+            if isinstance(body, str):
+                raise FuncCallError(node.name, node.line_number, node.position)
+            code_block = bodies.get(body)
+            if code_block is None:
+                code_block = bodies[body] = self.compile_code_block(body, chain)
+            code_block(frames, out, literals)
+        return func_call
+
+    def compile(self, node):
+        code_block = self.compile_code_block(node, [])
+
+        def script(literals=None):
+            out = []
+            code_block([], out, literals)
+            return "".join(out)
+        return script
+
+    def load(self, node):
+        if self.compiled:
+            return self.compile(node)
+        return lambda literals=None: self.exec_script(node, literals)
+
+    def make_template(self, node, literals):
+        if isinstance(node, CodeBlockNode):
+            for statement in node.statements:
+                self.make_template(statement, literals)
+        elif isinstance(node, FuncDefNode):
+            self.make_template(node.body, literals)
+        elif isinstance(node, (AssignNode, AddAssignNode, DocumentWriteCallNode)):
+            for i, arg in enumerate(node.expr.arguments):
+                if isinstance(arg, str):
+                    node.expr.arguments[i] = LiteralNode(len(literals))
+                    literals.append(arg)
+        return node
+
+    def exec_template(self, code):
+        scanner = Scanner(code)
+        key = []
+        literals = []
+        while True:
+            token = scanner.get_next_token()
+            if token.type is TokenType.STRING:
+                key.append(TokenType.STRING)
+                literals.append(token.value)
+            else:
+                key.append((token.type, token.value))
+            if token.type is TokenType.END:
+                break
+        key = tuple(key)
+        script = self.templates.get(key)
+        if script is None:
+            script = self.load(self.make_template(self.parser(code), []))
+            self.templates.put(key, script)
+        return script(literals)
+
+    def exec_script(self, node, literals=None):
         scopes = []
+        self.literals = literals
         try:
-            self.exec_code_block(self.parser(code), scopes, True)
-        except JSInterpreterError:
-            # print(code)
-            raise
+            self.exec_code_block(node, scopes, True)
+        finally:
+            self.literals = None
         return scopes[0]["document.write"]
+
+    def run(self, code):
+        if self.templates is not None:
+            try:
+                return self.exec_template(code)
+            except JSInterpreterError:
+                pass
+        return self.load(self.parser(code))()
+
+    def __call__(self, code):
+        if self.results is None:
+            return self.run(code)
+        result = self.results.get(code)
+        if result is None:
+            try:
+                result = self.run(code)
+            except JSInterpreterError as e:
+                result = e
+            self.results.put(code, result)
+        if isinstance(result, JSInterpreterError):
+            raise result
+        return result
+
+    def cache_info(self):
+        return {
+            "results": self.results.info() if self.results is not None else None,
+            "templates": self.templates.info() if self.templates is not None else None
+        }
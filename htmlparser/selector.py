@@ -1,4 +1,9 @@
+import os
 import re
+import sys
+import atexit
+import pickle
+import hashlib
 from enum import Enum, auto
 
 class TokenType(Enum):
@@ -255,6 +260,9 @@ class TagSelector:
     def __call__(self, element):
         return element.name == self.name
 
+    def source(self, var):
+        return "{}.name == {!r}".format(var, self.name)
+
 
 class ClassSelector:
     def __init__(self, name):
@@ -263,6 +271,9 @@ class ClassSelector:
     def __call__(self, element):
         return element.has_class(self.name)
 
+    def source(self, var):
+        return "{!r} in {}.classes".format(self.name, var)
+
 
 class AttrSelector:
     def __init__(self, name, value=None):
@@ -272,6 +283,11 @@ class AttrSelector:
     def __call__(self, element):
         return element.has_attr(self.name, self.value)
 
+    def source(self, var):
+        if self.value is None:
+            return "{!r} in {}.attrs".format(self.name, var)
+        return "{}.attrs.get({!r}) == {!r}".format(var, self.name, self.value)
+
 
 class NotPseudoClass:
     def __init__(self, selectors):
@@ -280,6 +296,9 @@ class NotPseudoClass:
     def __call__(self, element):
         return all(not selector(element) for selector in self.selectors)
 
+    def source(self, var):
+        return "not ({})".format(" or ".join(selector.source(var) for selector in self.selectors))
+
 
 class SelectorChain:
     def __init__(self, selectors):
@@ -288,6 +307,23 @@ class SelectorChain:
     def __call__(self, element):
         return all(selector(element) for selector in self.selectors)
 
+    def source(self, var):
+        return " and ".join(selector.source(var) for selector in self.selectors)
+
+    def compile(self):
+        return eval("lambda element: " + self.source("element"))
+
+    @property
+    def tag(self):
+        return self.selectors[0].name
+
+    def key(self):
+        for type_ in (ClassSelector, AttrSelector):
+            for selector in self.selectors:
+                if isinstance(selector, type_):
+                    return type_, selector.name
+        return TagSelector, None
+
 
 class SelectorList:
     def __init__(self, selectors):
@@ -322,11 +358,65 @@ class SelectorGroup:
         return len(self.selectors)
 
 
+class SelectorCache:
+    def __init__(self, path=None):
+        self.path = path
+        self.groups = {}
+        self.changed = False
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    self.groups = pickle.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                self.groups = {}
+            atexit.register(self.save)
+
+    def get(self, string):
+        return self.groups.get(string)
+
+    def add(self, string, selector_group):
+        self.groups[string] = selector_group
+        self.changed = True
+        return selector_group
+
+    def save(self):
+        if self.path is None or not self.changed:
+            return
+        tmp_path = "{}.{}".format(self.path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self.groups, f)
+            os.replace(tmp_path, self.path)
+            self.changed = False
+        except OSError:
+            pass
+
+    @staticmethod
+    def default_path():
+        try:
+            with open(__file__, "rb") as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+        except OSError:
+            return None
+        return os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "__pycache__",
+            "selectors.{}.{}.pickle".format(source_hash, sys.implementation.cache_tag)
+        )
+
+
 class Selector:
     parser = Parser()
+    compiled = True
+    cache = SelectorCache(SelectorCache.default_path())
 
     def __init__(self, string):
-        self.selector_group = self.parser(string)
+        self.string = string
+        self.selector_group = self.cache.get(string)
+        if self.selector_group is None:
+            self.selector_group = self.cache.add(string, self.parser(string))
 
     def __call__(self, elements):
         return self.selector_group(elements)
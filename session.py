@@ -0,0 +1,602 @@
+import io
+import os
+import time
+import zlib
+import random
+import hashlib
+import sqlite3
+import email.utils
+import threading
+import http.client
+import urllib.request
+import urllib.parse
+import urllib.error
+
+
+class ConnectionPool:
+    def __init__(self, scheme, host, port=None, max_connections=4, idle_timeout=30, timeout=None):
+        self.connection_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.idle = []
+        self.active_count = 0
+        self.condition = threading.Condition()
+
+    def evict(self, now):
+        while self.idle and now - self.idle[0][1] > self.idle_timeout:
+            self.idle.pop(0)[0].close()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                self.evict(time.monotonic())
+                if self.idle:
+                    connection = self.idle.pop()[0]
+                    self.active_count += 1
+                    return connection, True
+                if self.active_count + len(self.idle) < self.max_connections:
+                    self.active_count += 1
+                    break
+                self.condition.wait()
+        kwargs = {} if self.timeout is None else {"timeout": self.timeout}
+        return self.connection_cls(self.host, self.port, **kwargs), False
+
+    def release(self, connection, reusable=True):
+        with self.condition:
+            self.active_count -= 1
+            if reusable:
+                self.idle.append((connection, time.monotonic()))
+            else:
+                connection.close()
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            for connection, _ in self.idle:
+                connection.close()
+            self.idle = []
+
+
+class TransferStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+    def update(self, wire_bytes, decoded_bytes):
+        with self.lock:
+            self.wire_bytes += wire_bytes
+            self.decoded_bytes += decoded_bytes
+
+    def as_dict(self):
+        return {
+            "wire_bytes": self.wire_bytes,
+            "decoded_bytes": self.decoded_bytes,
+            "ratio": self.wire_bytes / self.decoded_bytes if self.decoded_bytes else 1.0
+        }
+
+
+class Response:
+    DRAIN_SIZE = 65536
+    CHUNK_SIZE = 65536
+
+    def __init__(self, url, response, pool, connection, stats):
+        self.url = url
+        self.response = response
+        self.pool = pool
+        self.connection = connection
+        self.stats = stats
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+        self.encoding = (response.getheader("Content-Encoding") or "identity").strip().lower()
+        if self.encoding in ("gzip", "x-gzip"):
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "deflate":
+            self.decompressor = zlib.decompressobj()
+        else:
+            self.decompressor = None
+        self.buffer = bytearray()
+        self.wire_size = 0
+        self.size = 0
+        if response.isclosed():
+            self.release(not response.will_close)
+
+    def release(self, reusable):
+        if self.connection is not None:
+            self.pool.release(self.connection, reusable)
+            self.connection = None
+
+    def read_raw(self, amt=None):
+        data = self.response.read(amt)
+        self.wire_size += len(data)
+        if self.response.isclosed():
+            self.release(not self.response.will_close)
+        return data
+
+    def decompress(self, data):
+        try:
+            return self.decompressor.decompress(data)
+        except zlib.error:
+            if self.encoding != "deflate" or self.wire_size > len(data):
+                raise
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self.decompressor.decompress(data)
+
+    def read(self, amt=None):
+        wire_size = self.wire_size
+        if self.decompressor is None:
+            data = self.read_raw(amt)
+        else:
+            while amt is None or len(self.buffer) < amt:
+                chunk = self.read_raw(self.CHUNK_SIZE)
+                if not chunk:
+                    self.buffer += self.decompressor.flush()
+                    break
+                self.buffer += self.decompress(chunk)
+            if amt is None:
+                data = bytes(self.buffer)
+                self.buffer.clear()
+            else:
+                data = bytes(self.buffer[:amt])
+                del self.buffer[:amt]
+        self.size += len(data)
+        self.stats.update(self.wire_size - wire_size, len(data))
+        return data
+
+    def getcode(self):
+        return self.status
+
+    def getheader(self, name, default=None):
+        return self.response.getheader(name, default)
+
+    def info(self):
+        return self.headers
+
+    def geturl(self):
+        return self.url
+
+    def close(self):
+        if self.connection is not None:
+            if self.response.length is not None and self.response.length <= self.DRAIN_SIZE:
+                try:
+                    self.read_raw()
+                except (http.client.HTTPException, OSError):
+                    pass
+            self.response.close()
+            self.release(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CachedResponse:
+    def __init__(self, url, data, headers):
+        self.url = url
+        self.status = 200
+        self.reason = "OK"
+        self.headers = headers
+        self.file = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self.file.read(amt)
+
+    def getcode(self):
+        return self.status
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def info(self):
+        return self.headers
+
+    def geturl(self):
+        return self.url
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CachingResponse:
+    def __init__(self, response, cache, key):
+        self.response = response
+        self.cache = cache
+        self.key = key
+        self.chunks = []
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def store(self):
+        chunks, self.chunks = self.chunks, None
+        self.cache.put(self.key, self.response, b"".join(chunks))
+
+    def read(self, amt=None):
+        try:
+            data = self.response.read(amt)
+        except BaseException:
+            self.chunks = None
+            raise
+        if self.chunks is not None:
+            self.chunks.append(data)
+            if amt is None or not data:
+                self.store()
+        return data
+
+    def close(self):
+        if self.chunks is not None:
+            try:
+                self.read()
+            except (http.client.HTTPException, OSError, zlib.error):
+                pass
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class HTTPCache:
+    def __init__(self, path, max_size, ttls):
+        self.path = path
+        self.max_size = max_size
+        self.ttls = ttls
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS `entries` (
+            `key` TEXT,
+            `url` TEXT NOT NULL,
+            `hash` TEXT NOT NULL,
+            `size` INTEGER NOT NULL,
+            `etag` TEXT,
+            `last_modified` TEXT,
+            `content_type` TEXT,
+            `fetched` REAL NOT NULL,
+            `accessed` REAL NOT NULL,
+            PRIMARY KEY(`key`)
+        )""")
+        self.connection.commit()
+
+    def ttl(self, url):
+        path = urllib.parse.urlsplit(url).path
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+        return None
+
+    @staticmethod
+    def key(method, url, data):
+        m = hashlib.sha256()
+        m.update(method.encode("ascii") + b" " + url.encode("utf-8") + b"\n")
+        if data:
+            m.update(data)
+        return m.hexdigest()
+
+    def object_path(self, hash_):
+        return os.path.join(self.path, "objects", hash_[:2], hash_)
+
+    def get(self, key):
+        with self.lock:
+            cursor = self.connection.execute(
+                """SELECT `hash`, `etag`, `last_modified`, `content_type`, `fetched` FROM `entries` WHERE `key` = ?""", (key,)
+            )
+            result = cursor.fetchone()
+            if result is None:
+                return None
+            try:
+                with open(self.object_path(result[0]), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return None
+            self.connection.execute("""UPDATE `entries` SET `accessed` = ? WHERE `hash` = ?""", (time.time(), result[0]))
+            self.connection.commit()
+        return dict(zip(("hash", "etag", "last_modified", "content_type", "fetched", "data"), result + (data,)))
+
+    def response(self, url, entry):
+        data = entry["data"]
+        headers = {}
+        for name, key in [("ETag", "etag"), ("Last-Modified", "last_modified"), ("Content-Type", "content_type")]:
+            if entry[key]:
+                headers[name] = entry[key]
+        return CachedResponse(url, data, headers)
+
+    def revalidate(self, key, entry):
+        entry = dict(entry, fetched=time.time())
+        with self.lock:
+            self.connection.execute("""UPDATE `entries` SET `fetched` = ? WHERE `key` = ?""", (entry["fetched"], key))
+            self.connection.commit()
+        return entry
+
+    def put(self, key, response, data):
+        hash_ = hashlib.sha256(data).hexdigest()
+        path = self.object_path(hash_)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self.lock:
+            self.connection.execute("""INSERT OR REPLACE INTO `entries` VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", (
+                key, response.url, hash_, len(data), response.getheader("ETag"), response.getheader("Last-Modified"),
+                response.getheader("Content-Type"), now, now
+            ))
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        cursor = self.connection.cursor()
+        cursor.execute("""SELECT SUM(`size`) FROM (SELECT DISTINCT `hash`, `size` FROM `entries`)""")
+        total_size = cursor.fetchone()[0] or 0
+        while total_size > self.max_size:
+            cursor.execute("""SELECT `hash`, `size` FROM `entries` GROUP BY `hash` ORDER BY MAX(`accessed`) LIMIT 1""")
+            hash_, size = cursor.fetchone()
+            cursor.execute("""DELETE FROM `entries` WHERE `hash` = ?""", (hash_,))
+            try:
+                os.remove(self.object_path(hash_))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+class TokenBucket:
+    def __init__(self, rate, min_rate, max_rate, increase, decrease, slow_latency):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_latency = slow_latency
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def success(self, latency):
+        with self.lock:
+            self.refill(time.monotonic())
+            if latency > self.slow_latency:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+            self.capacity = max(1.0, self.rate)
+
+    def failure(self, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.capacity = max(1.0, self.rate)
+            self.tokens = min(self.tokens, self.capacity)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+class RateLimiter:
+    def __init__(self, rate=4.0, min_rate=0.25, max_rate=16.0, increase=0.5, decrease=0.5, slow_latency=5.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_latency = slow_latency
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host):
+        with self.lock:
+            try:
+                return self.buckets[host]
+            except KeyError:
+                bucket = self.buckets[host] = TokenBucket(
+                    self.rate, self.min_rate, self.max_rate, self.increase, self.decrease, self.slow_latency
+                )
+                return bucket
+
+    def rates(self):
+        with self.lock:
+            return {host: bucket.rate for host, bucket in self.buckets.items()}
+
+
+class Session:
+    ACCEPT_ENCODING = "gzip, deflate"
+    MAX_REDIRECTS = 10
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+    RETRY_CODES = (429, 500, 502, 503, 504)
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 60.0
+
+    def __init__(self, headers=None, max_connections=4, idle_timeout=30, timeout=None, cookie_jar=None, cache=None,
+            rate_limiter=None, max_retries=0):
+        self.headers = headers or {}
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.cookie_jar = cookie_jar
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.pools = {}
+        self.lock = threading.Lock()
+        self.stats = TransferStats()
+
+    def pool(self, scheme, host, port):
+        key = (scheme, host, port)
+        with self.lock:
+            try:
+                return self.pools[key]
+            except KeyError:
+                pool = self.pools[key] = ConnectionPool(
+                    scheme, host, port, self.max_connections, self.idle_timeout, self.timeout
+                )
+                return pool
+
+    def send(self, request):
+        url_parts = urllib.parse.urlsplit(request.full_url)
+        pool = self.pool(url_parts.scheme, url_parts.hostname, url_parts.port)
+        path = request.selector
+        headers = dict(request.header_items())
+        bucket = self.rate_limiter.bucket(url_parts.hostname) if self.rate_limiter is not None else None
+        while True:
+            if bucket is not None:
+                bucket.acquire()
+            connection, reused = pool.acquire()
+            start_time = time.monotonic()
+            try:
+                connection.request(request.get_method(), path, request.data, headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                pool.release(connection, False)
+                if reused:
+                    continue
+                if bucket is not None:
+                    bucket.failure()
+                raise
+            except BaseException:
+                pool.release(connection, False)
+                if bucket is not None:
+                    bucket.failure()
+                raise
+            if bucket is not None:
+                if response.status in self.RETRY_CODES:
+                    bucket.failure(self.retry_after(response))
+                else:
+                    bucket.success(time.monotonic() - start_time)
+            return Response(request.full_url, response, pool, connection, self.stats)
+
+    @staticmethod
+    def retry_after(response):
+        value = response.getheader("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, date.timestamp() - time.time())
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt))
+
+    def fetch_with_retries(self, request, cookie_jar, redirect):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.fetch(request, cookie_jar, redirect)
+            except (OSError, http.client.HTTPException):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+            if response.status not in self.RETRY_CODES or attempt == self.max_retries:
+                return response
+            delay = self.retry_after(response)
+            response.close()
+            time.sleep(max(delay or 0.0, self.backoff(attempt)))
+
+    def fetch(self, request, cookie_jar, redirect):
+        for _ in range(self.MAX_REDIRECTS + 1):
+            if cookie_jar is not None:
+                cookie_jar.add_cookie_header(request)
+            response = self.send(request)
+            if cookie_jar is not None:
+                cookie_jar.extract_cookies(response, request)
+            if not redirect or response.status not in self.REDIRECT_CODES or not response.getheader("Location"):
+                return response
+            method = request.get_method()
+            if response.status in (307, 308) and method not in ("GET", "HEAD"):
+                return response
+            response.close()
+            url = urllib.parse.urljoin(request.full_url, response.getheader("Location"))
+            request_headers = {
+                key: value for key, value in request.headers.items() if key.lower() not in ("content-length", "content-type")
+            }
+            if response.status in (307, 308):
+                request = urllib.request.Request(url, request.data, request_headers, method=method)
+            else:
+                request = urllib.request.Request(url, None, request_headers, method="HEAD" if method == "HEAD" else "GET")
+        response.close()
+        raise urllib.error.HTTPError(response.url, response.status, "redirect loop", response.headers, None)
+
+    def request(self, method, url, data=None, headers=None, cookie_jar=None, redirect=True, raise_errors=True, cache=True):
+        cookie_jar = cookie_jar if cookie_jar is not None else self.cookie_jar
+        if isinstance(data, str):
+            data = data.encode("ascii")
+        request_headers = {"Accept-Encoding": self.ACCEPT_ENCODING}
+        request_headers.update(self.headers)
+        if headers:
+            request_headers.update(headers)
+        if data is not None and "Content-Type" not in request_headers:
+            request_headers["Content-Type"] = "application/x-www-form-urlencoded"
+        ttl = self.cache.ttl(url) if self.cache is not None and cache else None
+        if ttl is not None:
+            key = self.cache.key(method, url, data)
+            entry = self.cache.get(key)
+            if entry is not None:
+                if time.time() - entry["fetched"] < ttl:
+                    return self.cache.response(url, entry)
+                if entry["etag"]:
+                    request_headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    request_headers["If-Modified-Since"] = entry["last_modified"]
+        request = urllib.request.Request(url, data, request_headers, method=method)
+        response = self.fetch_with_retries(request, cookie_jar, redirect)
+        if ttl is not None:
+            if response.status == 304 and entry is not None:
+                response.close()
+                return self.cache.response(url, self.cache.revalidate(key, entry))
+            if response.status == 200:
+                response = CachingResponse(response, self.cache, key)
+        if raise_errors and not 200 <= response.status < 300:
+            response.close()
+            raise urllib.error.HTTPError(response.url, response.status, response.reason, response.headers, None)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, data, **kwargs):
+        return self.request("POST", url, data, **kwargs)
+
+    def close(self):
+        with self.lock:
+            for pool in self.pools.values():
+                pool.close()
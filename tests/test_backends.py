@@ -0,0 +1,109 @@
+import io
+import unittest
+from htmlparser import BACKENDS, HTMLParser, Collector, AttrHandler
+from tripadvparser import HotelHTMLParser, HotelsHTMLParser, HotelGalleryHTMLParser, HotelPriceHTMLParser
+
+HOTEL_HTML = """<!DOCTYPE html>
+<html><head>
+<script type="application/ld+json">{"address": {"streetAddress": "Khreshchatyk 1", "postalCode": "01001"}}</script>
+</head><body>
+<ul>
+<li class="breadcrumb" itemscope><span itemprop="title">Europe</span></li>
+<li class="breadcrumb" itemscope><span itemprop="title">Ukraine</span></li>
+<li class="breadcrumb" itemscope><span itemprop="title">Kyiv</span></li>
+<li class="breadcrumb" itemscope><span itemprop="title">Kyiv Hotels</span></li>
+</ul>
+<h1 id="HEADING" class="heading_title">Hotel &amp; Spa <b>Kyiv</b></h1>
+<div class="phone"><span><script>var a,b
+function f() {
+a = '+380 ' + '(44)'
+b += ' 123'
+}
+b = ''
+f()
+document.write(a + b + '-45-67')
+</script></span></div>
+<div class="website" data-ahref="LqMWJQzZYUWJQpEJkEJJ"></div>
+<div class="ui_columns section_content"><ul>
+<li class="item title">Amenities</li>
+<li class="item">Free Wifi</li>
+<li class="item">Pool</li>
+<li class="item">Free Wifi</li>
+</ul></div>
+<div class="description"><div class="section_content">A quiet <i>hotel</i> in the centre.</div></div>
+<ul class="list stars"><li><div class="ui_star_rating star_40"></div></li></ul>
+<ul class="list number_of_rooms"><li class="item title">Rooms</li><li class="item">120</li></ul>
+</body></html>
+"""
+
+HOTELS_HTML = """<div id="taplc_hsx_hotel_list_lite_dusty_hotels_combined_sponsored_0">
+<div class="listing" id="sponsoredCouponListing"><div class="listing_title">
+<a class="property_title" href="/Hotel_Review-g294474-d1-Reviews-Sponsored-Kiev.html">Sponsored</a>
+</div></div>
+<div class="listing"><div class="listing_title">
+<a class="property_title" href="/Hotel_Review-g294474-d2-Reviews-First-Kiev.html">First</a>
+</div></div>
+<div class="listing"><div class="listing_title">
+<a class="property_title" href="/Hotel_Review-g294474-d3-Reviews-Second-Kiev.html">Second</a>
+</div></div>
+<div class="standard_pagination" data-numpages="12" data-numpages="13"></div>
+</div>
+"""
+
+GALLERY_HTML = """<div class="photos">
+<a class="photoGridImg" href="#"><img src="https://media-cdn.tripadvisor.com/media/photo-s/01/02/03.jpg"></a>
+<a class="photoGridImg" href="#"><img src="https://media-cdn.tripadvisor.com/media/photo-s/01/02/04.jpg"/></a>
+<div class="tinyThumb" data-bigurl="https://media-cdn.tripadvisor.com/media/photo-s/01/02/05.jpg"></div>
+</div>
+"""
+
+PRICE_HTML = """<div class="offers">
+<div class="offer" data-offerclient="Booking.com" data-pernight="1200"></div>
+<div class="offer" data-offerclient="Expedia" data-pernight="1150"></div>
+</div>
+"""
+
+FIXTURES = [
+    (HotelHTMLParser, HOTEL_HTML),
+    (HotelsHTMLParser, HOTELS_HTML),
+    (HotelGalleryHTMLParser, GALLERY_HTML),
+    (HotelPriceHTMLParser, PRICE_HTML)
+]
+
+
+class DuplicateAttrHTMLParser(HTMLParser):
+    id = Collector("div.x", AttrHandler("id"))
+    first = Collector("div[id=\"first\"]")
+    second = Collector("div[id=\"second\"]")
+
+
+def parse(parser_cls, html, backend):
+    parser = parser_cls(backend=backend)
+    parser(html)
+    return parser.data
+
+
+@unittest.skipUnless("lxml" in BACKENDS, "lxml is not installed")
+class BackendParityTest(unittest.TestCase):
+    def test_parsers(self):
+        for parser_cls, html in FIXTURES:
+            with self.subTest(parser=parser_cls.__name__):
+                data = parse(parser_cls, html, "html.parser")
+                self.assertEqual(data, parse(parser_cls, html, "lxml"))
+
+    def test_stream(self):
+        for parser_cls, html in FIXTURES:
+            with self.subTest(parser=parser_cls.__name__):
+                data = parse(parser_cls, html, "html.parser")
+                self.assertEqual(data, parse(parser_cls, io.BytesIO(html.encode("utf-8")), "html.parser"))
+                self.assertEqual(data, parse(parser_cls, io.BytesIO(html.encode("utf-8")), "lxml"))
+
+    def test_duplicate_attrs(self):
+        html = "<div class=\"x\" id=\"first\" id=\"second\"></div>"
+        data = parse(DuplicateAttrHTMLParser, html, "html.parser")
+        self.assertEqual(data, {"id": ["first"], "first": 1, "second": 0})
+        self.assertEqual(data, parse(DuplicateAttrHTMLParser, html, "lxml"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import random
+import string
+import unittest
+from tripadvparser import WebsiteHandler
+
+ALPHABET = "qxz" * 4 + string.digits + ":;<=>?@" + string.ascii_uppercase + string.ascii_lowercase + "\0é€/"
+
+
+def reference_decode(encoded_url):
+    table = WebsiteHandler.TABLE
+    arr = []
+    jump = False
+    for i, ch1 in enumerate(encoded_url):
+        if jump:
+            jump = False
+            continue
+        ch2 = ch1
+        if ch1 in table and i + 1 < len(encoded_url):
+            i += 1
+            ch2 += encoded_url[i]
+            jump = True
+        else:
+            ch1 = ""
+        offset = -1
+        ch_code = ord(encoded_url[i])
+        if ch_code >= 97 and ch_code <= 122:
+            offset = ch_code - 61
+        elif ch_code >= 65 and ch_code <= 90:
+            offset = ch_code - 55
+        elif ch_code >= 48 and ch_code <= 71:
+            offset = ch_code - 48
+        if offset < 0:
+            arr.append(ch2)
+        else:
+            arr.append(table[ch1][offset])
+    return "".join(arr)
+
+
+def outcome(decode, encoded_url):
+    try:
+        return decode(encoded_url)
+    except TypeError:
+        return TypeError
+
+
+class WebsiteDecodeTest(unittest.TestCase):
+    def assertSameDecode(self, encoded_url):
+        expected = outcome(reference_decode, encoded_url)
+        self.assertEqual(outcome(WebsiteHandler.decode, encoded_url), expected, repr(encoded_url))
+
+    def test_known_url(self):
+        self.assertEqual(WebsiteHandler.decode("LqMWJQzZYUWJQpEJkEJJ"), "/ShowUrl-a_partnerKey.1-a_ura7raa")
+
+    def test_short_strings(self):
+        for a in ALPHABET:
+            for b in [""] + list(ALPHABET):
+                self.assertSameDecode(a + b)
+
+    def test_random_strings(self):
+        rng = random.Random(18)
+        type_errors = 0
+        for _ in range(20000):
+            encoded_url = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40)))
+            self.assertSameDecode(encoded_url)
+            if outcome(reference_decode, encoded_url) is TypeError:
+                type_errors += 1
+        self.assertGreater(type_errors, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,11 @@
 import os
 import os.path
 import re
+import string
 import shutil
 import argparse
 import sqlite3
 import logging
-import urllib.request
 import urllib.parse
 import urllib.error
 import http.client
@@ -15,10 +15,15 @@ import hashlib
 import time
 import datetime
 import collections
+import functools
 import json
+import asyncio
+import threading
+import concurrent.futures
 import yaml
 from htmlparser import *
 from htmlparser.jsinterpreter import JSInterpreter, JSInterpreterError
+from session import Session, HTTPCache, RateLimiter
 
 
 class ServicesHTMLParser(HTMLParser):
@@ -31,58 +36,59 @@ class HotelsHTMLParser(HTMLParser):
 
 
 class PhoneHandler(DataHandler):
+    js_interpreter = JSInterpreter(cache_size=1024, template_cache_size=64)
+    lock = threading.Lock()
+
     def __init__(self):
         super().__init__()
 
     def __call__(self, name, element):
         code = super().__call__(name, element)
-        js_interpreter = JSInterpreter()
         try:
-            return js_interpreter(code)
+            with self.lock:
+                return self.js_interpreter(code)
         except JSInterpreterError as e:
             raise ValueHandlerError(name, str(e))
 
 
 class WebsiteHandler(AttrHandler):
+    TABLE = {
+        "": ["&", "=", "p", "6", "?", "H", "%", "B", ".com", "k", "9", ".html", "n", "M", "r", "www.", "h", "b", "t", "a", "0", "/", "d", "O", "j", "http://", "_", "L", "i", "f", "1", "e", "-", "2", ".", "N", "m", "A", "l", "4", "R", "C", "y", "S", "o", "+", "7", "I", "3", "c", "5", "u", 0, "T", "v", "s", "w", "8", "P", 0, "g", 0],
+        "q": [0, "__3F__", 0, "Photos", 0, "https://", ".edu", "*", "Y", ">", 0, 0, 0, 0, 0, 0, "`", "__2D__", "X", "<", "slot", 0, "ShowUrl", "Owners", 0, "[", "q", 0, "MemberProfile", 0, "ShowUserReviews", '"', "Hotel", 0, 0, "Expedia", "Vacation", "Discount", 0, "UserReview", "Thumbnail", 0, "__2F__", "Inspiration", "V", "Map", ":", "@", 0, "F", "help", 0, 0, "Rental", 0, "Picture", 0, 0, 0, "hotels", 0, "ftp://"],
+        "x": [0, 0, "J", 0, 0, "Z", 0, 0, 0, ";", 0, "Text", 0, "(", "x", "GenericAds", "U", 0, "careers", 0, 0, 0, "D", 0, "members", "Search", 0, 0, 0, "Post", 0, 0, 0, "Q", 0, "$", 0, "K", 0, "W", 0, "Reviews", 0, ",", "__2E__", 0, 0, 0, 0, 0, 0, 0, "{", "}", 0, "Cheap", ")", 0, 0, 0, "#", ".org"],
+        "z": [0, "Hotels", 0, 0, "Icon", 0, 0, 0, 0, ".net", 0, 0, "z", 0, 0, "pages", 0, "geo", 0, 0, 0, "cnt", "~", 0, 0, "]", "|", 0, "tripadvisor", "Images", "BookingBuddy", 0, "Commerce", 0, 0, "partnerKey", 0, "area", 0, "Deals", "from", "\\", 0, "urlKey", 0, "'", 0, "WeatherUnderground", 0, "MemberSign", "Maps", 0, "matchID", "Packages", "E", "Amenities", "Travel", ".htm", 0, "!", "^", "G"]
+    }
+    PATTERN = re.compile(r"[qxz].|.", re.DOTALL)
+    PREFIX_PATTERN = re.compile(r"([qxz].)", re.DOTALL)
+    MAP = {
+        prefix + ch: value for prefix, values in TABLE.items()
+        for ch, value in zip(string.digits + string.ascii_uppercase + string.ascii_lowercase, values)
+    }
+    MAP.update({prefix + ch: value for prefix, values in TABLE.items() for ch, value in zip(":;<=>?@", values[10:])})
+    TRANSLATION = str.maketrans({ch: value for ch, value in MAP.items() if len(ch) == 1})
+
     def __init__(self):
         super().__init__("data-ahref")
 
     def __call__(self, name, element):
         return self.decode(super().__call__(name, element))
 
-    def decode(self, encoded_url):
-        table = {
-            "": ["&", "=", "p", "6", "?", "H", "%", "B", ".com", "k", "9", ".html", "n", "M", "r", "www.", "h", "b", "t", "a", "0", "/", "d", "O", "j", "http://", "_", "L", "i", "f", "1", "e", "-", "2", ".", "N", "m", "A", "l", "4", "R", "C", "y", "S", "o", "+", "7", "I", "3", "c", "5", "u", 0, "T", "v", "s", "w", "8", "P", 0, "g", 0],
-            "q": [0, "__3F__", 0, "Photos", 0, "https://", ".edu", "*", "Y", ">", 0, 0, 0, 0, 0, 0, "`", "__2D__", "X", "<", "slot", 0, "ShowUrl", "Owners", 0, "[", "q", 0, "MemberProfile", 0, "ShowUserReviews", '"', "Hotel", 0, 0, "Expedia", "Vacation", "Discount", 0, "UserReview", "Thumbnail", 0, "__2F__", "Inspiration", "V", "Map", ":", "@", 0, "F", "help", 0, 0, "Rental", 0, "Picture", 0, 0, 0, "hotels", 0, "ftp://"],
-            "x": [0, 0, "J", 0, 0, "Z", 0, 0, 0, ";", 0, "Text", 0, "(", "x", "GenericAds", "U", 0, "careers", 0, 0, 0, "D", 0, "members", "Search", 0, 0, 0, "Post", 0, 0, 0, "Q", 0, "$", 0, "K", 0, "W", 0, "Reviews", 0, ",", "__2E__", 0, 0, 0, 0, 0, 0, 0, "{", "}", 0, "Cheap", ")", 0, 0, 0, "#", ".org"],
-            "z": [0, "Hotels", 0, 0, "Icon", 0, 0, 0, 0, ".net", 0, 0, "z", 0, 0, "pages", 0, "geo", 0, 0, 0, "cnt", "~", 0, 0, "]", "|", 0, "tripadvisor", "Images", "BookingBuddy", 0, "Commerce", 0, 0, "partnerKey", 0, "area", 0, "Deals", "from", "\\", 0, "urlKey", 0, "'", 0, "WeatherUnderground", 0, "MemberSign", "Maps", 0, "matchID", "Packages", "E", "Amenities", "Travel", ".htm", 0, "!", "^", "G"]
-        }
-        arr = []
-        jump = False
-        for i, ch1 in enumerate(encoded_url):
-            if jump:
-                jump = False
-                continue
-            ch2 = ch1
-            if ch1 in table and i + 1 < len(encoded_url):
-                i += 1
-                ch2 += encoded_url[i]
-                jump = True
-            else:
-                ch1 = ""
-            offset = -1
-            ch_code = ord(encoded_url[i])
-            if ch_code >= 97 and ch_code <= 122:
-                offset = ch_code - 61
-            elif ch_code >= 65 and ch_code <= 90:
-                offset = ch_code - 55
-            elif ch_code >= 48 and ch_code <= 71:
-                offset = ch_code - 48
-            if offset < 0:
-                arr.append(ch2)
-            else:
-                arr.append(table[ch1][offset])
-        return "".join(arr)
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def decode(encoded_url):
+        parts = WebsiteHandler.PREFIX_PATTERN.split(encoded_url)
+        parts[::2] = [part.translate(WebsiteHandler.TRANSLATION) for part in parts[::2]]
+        parts[1::2] = [WebsiteHandler.MAP.get(part, part) for part in parts[1::2]]
+        try:
+            decoded_url = "".join(parts)
+        except TypeError:
+            decoded_url = "\0"
+        if "\0" in decoded_url:
+            decoded_url = "".join([WebsiteHandler.MAP.get(token, token) for token in WebsiteHandler.PATTERN.findall(encoded_url)])
+        return decoded_url
+
+    def decode_many(self, encoded_urls):
+        return [self.decode(encoded_url) for encoded_url in encoded_urls]
 
 
 class StarCountHandler:
@@ -129,7 +135,8 @@ class HotelHTMLParser(HTMLParser):
     star_count = Collector("ul.list.stars div.ui_star_rating", IntHandler(StarCountHandler()), limit=1)
     room_count = Collector("ul.list.number_of_rooms li.item:not(.title)", IntHandler(DataHandler()), limit=1)
 
-    def is_translation(self, name):
+    @staticmethod
+    def is_translation(name):
         return name in ["name", "location", "street", "phone", "services", "description"]
 
     def clean(self):
@@ -197,6 +204,12 @@ class IncorrectConfig(Exception):
 class TripAdvisorParser:
     LOCATION_PATH_PATTERN = re.compile(r"/Hotels-g(\d+)-[a-zA-Z_]+-Hotels\.html")
     HOTEL_PATH_PATTERN = re.compile(r"/Hotel_Review-g\d+-d(\d+)-Reviews-\w+-\w+\.html")
+    CACHE_ENDPOINTS = [
+        ("listing", re.compile(r"^/Hotels$")),
+        ("hotel", re.compile(r"^/Hotel_Review-|^/MetaPlacementAjax$")),
+        ("email", re.compile(r"^/EmailHotel$")),
+        ("gallery", re.compile(r"^/LocationPhotoAlbum$"))
+    ]
     HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"}
 
     def __init__(self):
@@ -216,6 +229,12 @@ class TripAdvisorParser:
         self.config["exclude_services"] = config.get("exclude_services", {})
         self.config["max_photo_count"] = config.get("max_photo_count")
         self.config["price_interval"] = config.get("price_interval", 15)
+        self.config["concurrency"] = config.get("concurrency", 8)
+        self.config["page_workers"] = config.get("page_workers", 4)
+        self.config["page_retries"] = config.get("page_retries", 2)
+        self.config["cache_max_size"] = config.get("cache_max_size", 512)
+        self.config["cache_ttl"] = {"listing": 24, "hotel": 168, "email": 720, "gallery": 168}
+        self.config["cache_ttl"].update(config.get("cache_ttl", {}))
         location_paths = {}
         hotel_paths = {}
         for path in config.get("paths", []):
@@ -238,6 +257,21 @@ class TripAdvisorParser:
             filemode="w", level=logging.ERROR
         )
         self.failure_count = 0
+        self.executor = concurrent.futures.ThreadPoolExecutor(self.config["concurrency"])
+        if self.config["cache_max_size"]:
+            ttls = []
+            for endpoint, pattern in self.CACHE_ENDPOINTS:
+                ttl = self.config["cache_ttl"].get(endpoint)
+                if ttl is not None:
+                    ttls.append((pattern, ttl * 3600))
+            cache = HTTPCache(os.path.join(self.config["out_dir_path"], "cache"), self.config["cache_max_size"] * 2 ** 20, ttls)
+        else:
+            cache = None
+        self.session = Session(
+            self.HEADERS, config.get("max_connections", 4), config.get("connection_idle_timeout", 30), config.get("timeout"),
+            cache=cache, rate_limiter=RateLimiter(config.get("request_rate", 4), max_rate=config.get("max_request_rate", 16)),
+            max_retries=config.get("max_retries", 4)
+        )
 
     def init_db(self):
         db_path = os.path.join(self.config["out_dir_path"], "tripadvisor.db")
@@ -256,13 +290,11 @@ class TripAdvisorParser:
         services = {}
         prev_lang = None
         for lang, domain in self.config["languages"].items():
-            request = urllib.request.Request("https://" + domain + self.config["services_path"], headers=self.HEADERS)
-            response = urllib.request.urlopen(request)
-            if response.getcode() != 200:
-                raise TripAdvisorParserError
-            parser = ServicesHTMLParser()
-            html = response.read().decode("utf-8")
-            parser(html)
+            with self.session.get("https://" + domain + self.config["services_path"]) as response:
+                if response.getcode() != 200:
+                    raise TripAdvisorParserError
+                parser = ServicesHTMLParser()
+                parser(response)
             if prev_lang and len(services[prev_lang]) != len(parser.data["services"]):
                 raise TripAdvisorParserError(
                     "services have different length in translations ('{}', '{}'): {} and {}".format(
@@ -301,22 +333,39 @@ class TripAdvisorParser:
             # "hs": "",
             # "pageSize": "",
         }
-        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor())
+        cookie_jar = http.cookiejar.CookieJar()
         url = "https://" + domain + "/Hotels"
-        request = urllib.request.Request(url, urllib.parse.urlencode(data).encode("ascii"), headers)
-        response = opener.open(request)
-        parser = HotelsHTMLParser()
-        parser(response.read().decode("utf-8"))
-        parser.disable("page_count")
-        hotel_paths = self.proc_hotel_paths(parser.data["paths"])
-        for i in range(30, parser.data["page_count"] * 30, 30):
-            data["o"] = "a" + str(i)
-            request = urllib.request.Request(url, urllib.parse.urlencode(data).encode("ascii"), headers)
-            response = opener.open(request)
-            parser(response.read().decode("utf-8"))
-            hotel_paths.update(self.proc_hotel_paths(parser.data["paths"]))
+        page = self.parse_hotels_page(url, data, headers, cookie_jar, True)
+        hotel_paths = self.proc_hotel_paths(page["paths"])
+        with concurrent.futures.ThreadPoolExecutor(self.config["page_workers"]) as executor:
+            futures = []
+            for i in range(30, page["page_count"] * 30, 30):
+                page_data = data.copy()
+                page_data["o"] = "a" + str(i)
+                futures.append(executor.submit(self.parse_hotels_page, url, page_data, headers, cookie_jar))
+            try:
+                for future in futures:
+                    hotel_paths.update(self.proc_hotel_paths(future.result()["paths"]))
+            finally:
+                for future in futures:
+                    future.cancel()
         return hotel_paths
 
+    def parse_hotels_page(self, url, data, headers, cookie_jar, first=False):
+        for attempt in range(self.config["page_retries"] + 1):
+            parser = HotelsHTMLParser()
+            if not first:
+                parser.disable("page_count")
+            with self.session.post(url, urllib.parse.urlencode(data), headers=headers, cookie_jar=cookie_jar, cache=not first) as response:
+                try:
+                    parser(response)
+                except (OSError, http.client.HTTPException):
+                    if attempt == self.config["page_retries"]:
+                        raise
+                else:
+                    return parser.data
+            time.sleep(self.session.backoff(attempt))
+
     @staticmethod
     def zip_translation(translation):
         for texts in zip(*translation.values()):
@@ -345,15 +394,27 @@ class TripAdvisorParser:
     #         url_parts[3] = urllib.parse.urlencode(query, doseq=True)
     #         return urllib.parse.urlunsplit(url_parts)
 
+    def fetch_page(self, url):
+        with self.session.get(url) as response:
+            return response.read()
+
+    def fetch_redirect(self, url):
+        with self.session.get(url, redirect=False, raise_errors=False) as response:
+            return response.status, response.getheader("Location")
+
     def get_website(self, path):
         website = {}
+        futures = collections.OrderedDict()
         for lang, domain in self.config["languages"].items():
-            connection = http.client.HTTPSConnection(domain)
-            connection.request("GET", path, headers=self.HEADERS)
-            response = connection.getresponse()
-            if response.status == 302:
-                website[lang] = response.getheader("Location")
-            connection.close()
+            futures[lang] = self.executor.submit(self.fetch_redirect, "https://" + domain + path)
+        try:
+            for lang, future in futures.items():
+                status, location = future.result()
+                if status == 302:
+                    website[lang] = location
+        finally:
+            for future in futures.values():
+                future.cancel()
         if website:
             return website
 
@@ -366,18 +427,14 @@ class TripAdvisorParser:
             "rooms": 1
         })
         url = "https://" + domain + "/EmailHotel?" + query
-        opener = urllib.request.OpenerDirector()
-        opener.add_handler(urllib.request.HTTPSHandler())
-        opener.add_handler(urllib.request.HTTPDefaultErrorHandler())
-        opener.add_handler(urllib.request.HTTPErrorProcessor())
-        request = urllib.request.Request(url, headers=self.HEADERS)
         try:
-            response = opener.open(request)
+            response = self.session.get(url, redirect=False)
         except urllib.error.HTTPError:
             return None
         else:
-            parser = HotelEmailHTMLParser()
-            parser(response.read().decode("utf-8"))
+            with response:
+                parser = HotelEmailHTMLParser(early_exit=True)
+                parser(response)
             return parser.data["email"]
 
     def parse_photo_urls(self, hotel_id):
@@ -387,10 +444,9 @@ class TripAdvisorParser:
             "filter": 1
         })
         url = "https://" + domain + "/LocationPhotoAlbum?detail=" + query
-        request = urllib.request.Request(url, headers=self.HEADERS)
-        response = urllib.request.urlopen(request)
         parser = HotelGalleryHTMLParser()
-        parser(response.read().decode("utf-8"))
+        with self.session.get(url) as response:
+            parser(response)
         raw_urls = parser.data["photo_urls"]
         urls = []
         for url in raw_urls:
@@ -398,9 +454,14 @@ class TripAdvisorParser:
                 urls.append(url)
         return urls
 
-    def parse_hotel(self, path, hotel_id):
-        hotel = {}
+    def parse_hotel_translation(self, url, extra_page):
         parser = HotelHTMLParser()
+        with self.session.get(url) as response:
+            parser(response, False)
+        parser(extra_page.result())
+        return parser.data
+
+    def parse_hotel(self, path, hotel_id):
         query = urllib.parse.urlencode({
             "detail": hotel_id,
             "placementName": "hr_btf_north_star_about",
@@ -408,21 +469,25 @@ class TripAdvisorParser:
             "servletName": "Hotel_Review",
             "more_content_request": "true"
         })
-        prev_lang = None
+        email = self.executor.submit(self.get_email, hotel_id)
+        futures = [email]
+        translations = collections.OrderedDict()
         for lang, domain in self.config["languages"].items():
-            html_pages = []
-            urls = [
-                "https://" + domain + path,
-                "https://" + domain + "/MetaPlacementAjax?" + query
-            ]
-            for url in urls:
-                request = urllib.request.Request(url, headers=self.HEADERS)
-                response = urllib.request.urlopen(request)
-                html_pages.append(response.read().decode("utf-8"))
-            for i, html in enumerate(html_pages, start=1):
-                parser(html, i == len(html_pages))
-            for name, val in parser.data.items():
-                if not parser.is_translation(name):
+            extra_page = self.executor.submit(self.fetch_page, "https://" + domain + "/MetaPlacementAjax?" + query)
+            translations[lang] = self.executor.submit(self.parse_hotel_translation, "https://" + domain + path, extra_page)
+            futures += [extra_page, translations[lang]]
+        try:
+            return self.proc_hotel(translations, email)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def proc_hotel(self, translations, email):
+        hotel = {}
+        prev_lang = None
+        for lang, future in translations.items():
+            for name, val in future.result().items():
+                if not HotelHTMLParser.is_translation(name):
                     if prev_lang and hotel[name] != val:
                         raise TripAdvisorParserError(
                             "field '{}' has different value in translations ('{}', '{}'): '{}'  and '{}'".format(
@@ -454,7 +519,7 @@ class TripAdvisorParser:
             prev_lang = lang
         if hotel["website"]:
             hotel["website"] = self.get_website(hotel["website"])
-        hotel["email"] = self.get_email(hotel_id)
+        hotel["email"] = email.result()
         return hotel
 
     def create_tables(self):
@@ -702,7 +767,9 @@ class TripAdvisorParser:
         self.connection.commit()
 
     def fetch_hotel(self, path, hotel_id):
-        hotel = self.parse_hotel(path, hotel_id)
+        self.store_hotel(path, self.parse_hotel(path, hotel_id))
+
+    def store_hotel(self, path, hotel):
         hotel["path"] = path
         self.create_hotel(hotel)
 
@@ -723,7 +790,7 @@ class TripAdvisorParser:
             self.create_service(name, False)
         self.connection.commit()
 
-    def fetch_hotels(self):
+    def fetch_hotels(self, async_mode=False):
         self.init_db()
         print("fetching main services: {}".format(self.config["services_path"]))
         self.fetch_main_services()
@@ -744,11 +811,31 @@ class TripAdvisorParser:
                 del hotel_paths[path]
         if hotel_paths:
             print("fetching hotels:")
-            for i, values in enumerate(hotel_paths.items(), start=1):
-                path, hotel_id = values
+            if async_mode:
+                asyncio.run(self.fetch_hotels_async(hotel_paths))
+            else:
+                for i, values in enumerate(hotel_paths.items(), start=1):
+                    path, hotel_id = values
+                    print("{} of {}: {}".format(i, len(hotel_paths), path))
+                    status = self.handle_error(lambda: self.fetch_hotel(path, hotel_id), path)
+                    print("{}, {} failures".format(status, self.failure_count))
+        info = PhoneHandler.js_interpreter.cache_info()
+        print("phone cache: {:.0%} hits, templates: {:.0%} hits".format(info["results"]["hit_rate"], info["templates"]["hit_rate"]))
+
+    async def fetch_hotels_async(self, hotel_paths):
+        loop = asyncio.get_running_loop()
+        executor = concurrent.futures.ThreadPoolExecutor(self.config["concurrency"])
+        tasks = [loop.run_in_executor(executor, self.parse_hotel, path, hotel_id) for path, hotel_id in hotel_paths.items()]
+        try:
+            for i, (path, task) in enumerate(zip(hotel_paths, tasks), start=1):
+                await asyncio.wait([task])
                 print("{} of {}: {}".format(i, len(hotel_paths), path))
-                status = self.handle_error(lambda: self.fetch_hotel(path, hotel_id), path)
+                status = self.handle_error(lambda: self.store_hotel(path, task.result()), path)
                 print("{}, {} failures".format(status, self.failure_count))
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(True, cancel_futures=True)
 
     def update_hotels(self): # TODO
         pass
@@ -773,13 +860,13 @@ class TripAdvisorParser:
         return result[0]
 
     def load_image(self, url):
-        request = urllib.request.Request(url, headers=self.HEADERS)
         try:
-            response = urllib.request.urlopen(request)
+            response = self.session.get(url)
         except urllib.error.HTTPError:
             return None
         else:
-            return response.read()
+            with response:
+                return response.read()
 
     def fetch_hotel_photos(self, hotel_id, path):
         cursor = self.connection.cursor()
@@ -839,13 +926,11 @@ class TripAdvisorParser:
         })
         domain = self.config["languages"]["en"]
         url = "https://" + domain + path + "?"
-        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor())
-        request = urllib.request.Request(url, req_1_data.encode("ascii"), headers=req_1_headers)
-        opener.open(request)
-        request = urllib.request.Request(url, req_2_data.encode("ascii"), headers=req_2_headers)
-        response = opener.open(request)
+        cookie_jar = http.cookiejar.CookieJar()
+        self.session.post(url, req_1_data, headers=req_1_headers, cookie_jar=cookie_jar, cache=False).close()
         parser = HotelPriceHTMLParser()
-        parser(response.read().decode("utf-8"))
+        with self.session.post(url, req_2_data, headers=req_2_headers, cookie_jar=cookie_jar, cache=False) as response:
+            parser(response)
         return parser.data
 
     def create_hotel_price(self, hotel_id, date, price):
@@ -937,10 +1022,11 @@ if __name__ == "__main__":
     start_time = time.time()
     parser = argparse.ArgumentParser()
     parser.add_argument("task", choices=["fetch_hotels", "fetch_photos", "fetch_prices", "clean"], help="execute task")
+    parser.add_argument("-a", "--async", dest="async_mode", action="store_true", help="fetch hotels concurrently")
     args = parser.parse_args()
     ta_parser = TripAdvisorParser()
     if args.task == "fetch_hotels":
-        ta_parser.fetch_hotels()
+        ta_parser.fetch_hotels(args.async_mode)
     elif args.task == "fetch_photos":
         ta_parser.fetch_photos()
     elif args.task == "fetch_prices":
@@ -949,3 +1035,5 @@ if __name__ == "__main__":
         ta_parser.clean()
     elapsed_time = int(time.time() - start_time)
     print("elapsed: {}m {}s, {} failures".format(elapsed_time // 60, elapsed_time % 60, ta_parser.failure_count))
+    stats = ta_parser.session.stats.as_dict()
+    print("transferred: {:.1f} MB on the wire, {:.1f} MB decoded".format(stats["wire_bytes"] / 2 ** 20, stats["decoded_bytes"] / 2 ** 20))